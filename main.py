@@ -12,23 +12,22 @@ by Cees Timmerman
 """
 
 # pylint: disable=consider-using-f-string, global-statement, line-too-long, multiple-imports, no-member, too-many-boolean-expressions, too-many-branches, too-many-lines, too-many-locals, too-many-nested-blocks, too-many-statements, unused-argument, unused-import, wrong-import-position
-import argparse, base64, enum, functools, gzip, logging, os, pathlib, random, re, time, tkinter, zipfile  # noqa: E401
+import argparse, enum, functools, gzip, logging, math, os, pathlib, queue, random, re, threading, time, tkinter, zipfile  # noqa: E401
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.parser import BytesParser
 from io import BytesIO
 from tkinter import filedialog, messagebox, simpledialog, ttk
 from typing import Optional
 
 import pillow_avif  # type: ignore  # noqa: F401  # pylint: disable=E0401
 import pillow_jxl  # noqa: F401
-import pyperclip  # type: ignore
 from PIL import Image, ImageGrab, ImageTk
 from PIL.Image import Transpose
 from pillow_heif import register_heif_opener  # type: ignore
 from tkinterdnd2 import DND_FILES, TkinterDnD  # type: ignore
 
-os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
-import pygame  # noqa: E402
-
-from metadata import info_get  # noqa: E402
+from metadata import info_exiftool, info_get
 
 
 class Fits(enum.IntEnum):
@@ -40,10 +39,23 @@ class Fits(enum.IntEnum):
     SMALL = 3
 
 
+# Tk photos take ~4 bytes per pixel, so this keeps at most ~20 MB of looping
+# frames, e.g. 38 frames of 480x270; longer or bigger ones stream instead.
+ANIMATION_CACHE_PIXELS = 5_000_000
 BG_COLORS = ["black", "gray10", "gray50", "white"]
 FOLDER = os.path.dirname(os.path.realpath(__file__))
 CONFIG_FILE = os.path.join(FOLDER, "state")
+CAPITALIZE_RE = re.compile("((^|[+])[a-z])", re.MULTILINE)
+DROP_BRACED_RE = re.compile("{(.+?)}")
+DROP_SPACED_RE = re.compile("[^ ]+")
 FONT_SIZE = 14
+GEOMETRY_ARG_RE = re.compile(r" (-g|--geometry) ([^\s]+)")
+IM_LOCK = threading.Lock()  # Seeking APP.im from the animation thread.
+NUMBERS_RE = re.compile(r"(\d+)")
+PREFETCHER = ThreadPoolExecutor(max_workers=1)  # Decodes neighbours one by one.
+# Box-reduce big downscales to twice the target before resampling, like thumbnail().
+REDUCING_GAP = 2.0
+RESIZE_DELAY = 50  # ms
 RESIZE_QUALITY = [
     Image.Resampling.NEAREST,
     Image.Resampling.BOX,
@@ -54,10 +66,20 @@ RESIZE_QUALITY = [
 ]
 SCALE_MIN = 0.001
 SCALE_MAX = 40.0
+SCROLL_KEYS = {
+    "Left": (tkinter.Canvas.xview_scroll, -1),
+    "Right": (tkinter.Canvas.xview_scroll, 1),
+    "Up": (tkinter.Canvas.yview_scroll, -1),
+    "Down": (tkinter.Canvas.yview_scroll, 1),
+}
 SCROLL_SPEED = 10.0
+SHIFTED_RE = re.compile("([QTU])\\b")
+SINGLE_KEY_RE = re.compile("[a-z]( |$)")
 SORTS = "natural string ctime mtime size".split()
+SVG_ATTRS_RE = re.compile(r'\s(viewbox|width|height)\s*=\s*"([^"]*)"', re.IGNORECASE)
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S%z"
 TITLE = __doc__.split("\n", 1)[0]
+TRANSPOSE_NAMES = [t.name for t in Transpose]  # Indexed by value.
 VERBOSITY_LEVELS = [
     logging.CRITICAL,
     logging.ERROR,
@@ -65,6 +87,8 @@ VERBOSITY_LEVELS = [
     logging.INFO,
     logging.DEBUG,
 ]
+ZOOM_DELAY = 30  # ms to gather wheel ticks into one resample.
+ZOOM_FACTORS = {"plus": 1.1, "equal": 1.1, "minus": 0.9}  # Other keys reset.
 
 # Add a handler to stream to sys.stderr warnings from all modules.
 logging.basicConfig(format="%(levelname)s: %(message)s")
@@ -85,6 +109,67 @@ def log_this(func):
     return inner
 
 
+def animation_duration() -> int:
+    """Return frame duration in ms."""
+    return int(APP.info["duration"] or 100) if "duration" in APP.info else 100
+
+
+def animation_show():
+    """Show next decoded animation frame."""
+    frames_tk = APP.frames_tk
+    try:
+        if frames_tk is not None and len(frames_tk) == APP.im.n_frames:
+            # Every frame has been shown once; loop over the Tk images.
+            APP.im_frame = (APP.im_frame + 1) % len(frames_tk)
+            tkim_show(frames_tk[APP.im_frame])
+        else:
+            APP.im_frame, im = APP.frames.get_nowait()
+            if frames_tk is None:
+                tkim_set(im)
+            else:
+                frames_tk[APP.im_frame] = ImageTk.PhotoImage(im)
+                tkim_show(frames_tk[APP.im_frame])
+        duration = animation_duration()
+    except queue.Empty:
+        duration = 10  # Decoder fell behind.
+    APP.animation = APP.after(duration, animation_show)
+
+
+def animation_start(size):
+    """Decode frames on a thread and show them on a timer."""
+    APP.frames = queue.Queue(maxsize=3)
+    APP.frames_im = APP.im
+    APP.frames_stop = threading.Event()
+    # Small enough animations are decoded for one lap only.
+    cached = size[0] * size[1] * APP.im.n_frames <= ANIMATION_CACHE_PIXELS
+    APP.frames_tk = {} if cached else None
+    threading.Thread(
+        target=animation_worker,
+        args=(
+            APP.im,
+            APP.im_frame,
+            (size, APP.quality, APP.transpose_type, APP.im.n_frames if cached else -1),
+            APP.frames,
+            APP.frames_stop,
+        ),
+        daemon=True,
+    ).start()
+    APP.animation = APP.after(animation_duration(), animation_show)
+
+
+def animation_stop() -> bool:
+    """Stop animation. Return whether it was running."""
+    if not hasattr(APP, "animation"):
+        return False
+    APP.after_cancel(APP.animation)
+    del APP.animation
+    APP.frames_stop.set()
+    with IM_LOCK:  # Wait for the frame being decoded.
+        if APP.frames_im is APP.im and APP.im.tell() != APP.im_frame:
+            APP.im.seek(APP.im_frame)
+    return True
+
+
 def animation_toggle(event=None):
     """Toggle animation."""
     APP.b_animate = not APP.b_animate
@@ -92,8 +177,9 @@ def animation_toggle(event=None):
         toast("Starting animation.")
         im_resize(APP.b_animate)
     else:
+        animation_stop()
         s = "Stopping animation." + (
-            f" Frame {1 + (1 + APP.im_frame) % APP.im.n_frames}/{APP.im.n_frames}"
+            f" Frame {1 + APP.im_frame}/{APP.im.n_frames}"
             if hasattr(APP.im, "n_frames")
             else ""
         )
@@ -101,13 +187,35 @@ def animation_toggle(event=None):
         toast(s)
 
 
+def animation_worker(im, i, transform, frames, stop):
+    """Decode, resize, and queue animation frames ahead of display."""
+    size, quality, transpose_type, count = transform
+    while count:  # Negative loops until stopped.
+        count -= 1
+        i = (i + 1) % im.n_frames
+        with IM_LOCK:
+            if stop.is_set():
+                return
+            try:
+                im.seek(i)
+            except EOFError as ex:
+                LOG.error("IMAGE EOF. %s", ex)
+            frame = im.resize(size, quality, reducing_gap=im_reducing_gap(im))
+        if transpose_type != -1:
+            frame = frame.transpose(transpose_type)
+        while not stop.is_set():
+            try:
+                frames.put((i, frame), timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
 def bind():
     """Binds input events to functions."""
     # APP.bind_all("<Key>", debug_keys)
-    for b in BINDS:
-        func = b[0]
-        for event in b[1].split(" "):
-            APP.bind(f"<{event}>", func)
+    for event, func in BIND_EVENTS:
+        APP.bind(event, func)
 
 
 def browse(event=None, delta: int = 0, pos: Optional[int] = None):
@@ -171,8 +279,9 @@ def browse_frame(event=None):
         if APP.im_frame > n:
             APP.im_frame = 0
 
+    loop = animation_stop()
     APP.im.seek(APP.im_frame)
-    im_resize()
+    im_resize(loop)
     toast(f"Frame {1 + APP.im_frame}/{1 + n}", 1000)
 
 
@@ -247,6 +356,8 @@ def browse_search(event):
 
 def clipboard_copy(event=None):
     """Copy info to clipboard."""
+    import pyperclip  # type: ignore  # pylint:disable=import-outside-toplevel  # Only needed on copy.
+
     if CANVAS.find_closest(0, 0) == (CANVAS.text_bg,):
         LOG.debug("Copying overlay.")
         pyperclip.copy(CANVAS.itemcget(CANVAS.text, "text"))
@@ -324,7 +435,7 @@ def config_save():
             else:
                 s = s.replace(" -m", "")
                 g = APP.geometry()
-            s = re.sub(r" (-g|--geometry) ([^\s]+)", rf" \1 {g}", s)
+            s = GEOMETRY_ARG_RE.sub(rf" \1 {g}", s)
             LOG.debug("Saving state %s", s)
             fp.seek(0)
             fp.write(s)
@@ -376,8 +487,17 @@ def drag(event):
     """Drag image."""
     if event.widget != CANVAS:
         return
+    # Coalesce motion events into one move per idle cycle.
+    if not CANVAS.drag_pending:
+        APP.after_idle(drag_flush)
+    CANVAS.drag_pending = (event.x, event.y)
+
 
-    evx, evy = CANVAS.canvasx(event.x), CANVAS.canvasy(event.y)
+def drag_flush():
+    """Move image to latest drag position."""
+    evx, evy = CANVAS.drag_pending
+    CANVAS.drag_pending = None
+    evx, evy = CANVAS.canvasx(evx), CANVAS.canvasy(evy)
     x, y, x2, y2 = CANVAS.bbox(CANVAS.image_ref)
     w = x2 - x
     h = y2 - y
@@ -419,9 +539,9 @@ def select(event):
 def drop_handler(event):
     """Handles dropped files."""
     LOG.debug("Dropped %r", event.data)
+    pattern = DROP_BRACED_RE if "{" in event.data else DROP_SPACED_RE
     APP.paths = [
-        pathlib.Path(line.strip('"'))
-        for line in re.findall("{(.+?)}" if "{" in event.data else "[^ ]+", event.data)
+        pathlib.Path(line.strip('"')) for line in pattern.findall(event.data)
     ]  # Windows 11.
     if isinstance(APP.paths, list):
         LOG.debug("Set paths to %s", APP.paths)
@@ -438,46 +558,63 @@ def error_show(msg: str):
     APP.i_path_old = -1  # To refresh image info.
 
 
+def exiftool_append(path):
+    """Read exiftool info off the UI thread and add it to the info overlay."""
+    if path == "pasted":
+        return
+    results: queue.Queue = queue.Queue()
+    APP.exiftool_results = results  # Only the latest request gets shown.
+    mtime = path_stat(path).st_mtime_ns
+    threading.Thread(
+        target=lambda: results.put(exiftool_info(path, mtime)), daemon=True
+    ).start()
+    exiftool_apply(results)
+
+
+def exiftool_apply(results: queue.Queue):
+    """Append exiftool info once read."""
+    try:
+        s = results.get_nowait()
+    except queue.Empty:
+        APP.after(50, exiftool_apply, results)
+        return
+    if s and results is APP.exiftool_results and APP.showing not in ("", "help"):
+        info_set(APP.showing + "\n\n" + s)
+
+
+@functools.lru_cache(maxsize=64)
+def exiftool_info(path, mtime_ns: int) -> str:
+    """Return exiftool info, cached per file version for browsing back."""
+    return info_exiftool(path)
+
+
 def help_toggle(event=None):
     """Toggle help."""
     if APP.showing == "help":
         info_hide()
     else:
-        lines = []
-        for fun, keys in BINDS:
-            if fun in (drag_begin, drag_end, resize_handler):
-                continue
-            lines.append(
-                (
-                    ""
-                    if " - " in fun.__doc__
-                    else re.sub(
-                        "((^|[+])[a-z])",
-                        lambda m: m.group(1).upper(),
-                        re.sub(
-                            "([QTU])\\b",
-                            "Shift+\\1",
-                            keys.replace("Key-", "")
-                            .replace("Button-", "B")
-                            .replace("Mouse", "")
-                            .replace("Control-", "Ctrl+")
-                            .replace("Alt-", "Alt+")
-                            .replace("Shift-", "Shift+")
-                            .replace(" Prior ", " PageUp ")
-                            .replace(" Next ", " PageDown "),
-                        ),
-                        0,
-                        re.MULTILINE,
-                    )
-                    + " - "
-                )
-                + fun.__doc__.replace("...", "")
-            )
-        msg = "\n".join(lines)
-        info_set(msg)
+        info_set(HELP)
         APP.showing = "help"
         info_show()
-        LOG.debug(msg)
+        LOG.debug(HELP)
+
+
+def help_keys(keys: str) -> str:
+    """Make key names readable."""
+    return CAPITALIZE_RE.sub(
+        lambda m: m.group(1).upper(),
+        SHIFTED_RE.sub(
+            "Shift+\\1",
+            keys.replace("Key-", "")
+            .replace("Button-", "B")
+            .replace("Mouse", "")
+            .replace("Control-", "Ctrl+")
+            .replace("Alt-", "Alt+")
+            .replace("Shift-", "Shift+")
+            .replace(" Prior ", " PageUp ")
+            .replace(" Next ", " PageDown "),
+        ),
+    )
 
 
 def info_set(msg: str):
@@ -487,135 +624,128 @@ def info_set(msg: str):
     info_bg_update()
 
 
-def info_bg_update():
+def info_bg_update(bb=None):
     """Update info overlay."""
-    x1, y1, x2, y2 = CANVAS.bbox(CANVAS.text)
-    CANVAS.text_bg_tkim = ImageTk.PhotoImage(  # type: ignore
-        Image.new("RGBA", (x2 - x1, y2 - y1), "#000a")
-    )
-    CANVAS.itemconfig(CANVAS.text_bg, image=CANVAS.text_bg_tkim)  # type: ignore
+    x1, y1, x2, y2 = CANVAS.text_bb = bb or CANVAS.bbox(CANVAS.text)
+    size = (x2 - x1, y2 - y1)
+    # Text changes often keep the box size, e.g. when browsing with info shown.
+    if size != CANVAS.text_bg_size:
+        CANVAS.text_bg_size = size
+        CANVAS.text_bg_tkim = ImageTk.PhotoImage(  # type: ignore
+            Image.new("RGBA", size, "#000a")
+        )
+        CANVAS.itemconfig(CANVAS.text_bg, image=CANVAS.text_bg_tkim)  # type: ignore
     CANVAS.coords(CANVAS.im_bg, x1, y1, x2, y2)
 
 
 def lines_toggle(event=None, on=None, off=None):
     """Toggle line overlay."""
+    was_on = APP.b_lines
     APP.b_lines = True if on else False if off else not APP.b_lines  # NOSONAR
-    if not APP.b_lines and CANVAS.lines:
-        for line in CANVAS.lines:
-            CANVAS.delete(line)
-        CANVAS.lines = []
-    if APP.b_lines and not CANVAS.lines:
+    if APP.b_lines == was_on:
+        return
+    if APP.b_lines:
         w = APP.winfo_width() - 1
         h = APP.winfo_height() - 1
-        # Windows sucks at dashed lines. https://tcl.tk/man/tcl8.5/TkCmd/canvas.htm#M18
-        CANVAS.lines.append(
-            CANVAS.create_line(0, 0, w, 0, 0, h, w, h, fill="white", dash=(6, 4))
-        )
-        CANVAS.lines.append(
-            CANVAS.create_line(0, 0, w, 0, 0, h, w, h, fill="black", dash=(2, 4))
-        )
-        CANVAS.lines.append(
-            CANVAS.create_line(0, h, 0, 0, w, h, w, 0, fill="white", dash=(6, 4))
-        )
-        CANVAS.lines.append(
-            CANVAS.create_line(0, h, 0, 0, w, h, w, 0, fill="black", dash=(2, 4))
-        )
+        CANVAS.coords(CANVAS.lines[0], 0, 0, w, 0, 0, h, w, h)
+        CANVAS.coords(CANVAS.lines[1], 0, 0, w, 0, 0, h, w, h)
+        CANVAS.coords(CANVAS.lines[2], 0, h, 0, 0, w, h, w, 0)
+        CANVAS.coords(CANVAS.lines[3], 0, h, 0, 0, w, h, w, 0)
+        CANVAS.lift("lines")
+    CANVAS.itemconfig("lines", state="normal" if APP.b_lines else "hidden")
 
 
 def load_mhtml(path):
     """Load EML/MHT/MHTML."""
-    with open(path, "r", encoding="utf8") as f:
-        mhtml = f.read()
-    boundary = re.search('boundary="(.+)"', mhtml).group(1)
-    parts = mhtml.split(boundary)[1:-1]
-    APP.info["Names"] = []
-    new_parts = []
-    for p in parts:
-        meta, data = p.split("\n\n", maxsplit=1)
-        m = meta.lower()
-        if "\ncontent-transfer-encoding: base64" not in m:
-            continue
-        if "\ncontent-type:" in m and "\ncontent-type: image" not in m:
-            continue
-        name = sorted(meta.strip().split("\n"))[0].split("/")[-1]
-        APP.info["Names"].append(name)
-        new_parts.append(data)
-    if not new_parts:
+    key = (path, os.stat(path).st_mtime_ns)
+    if getattr(APP, "mhtml_cache", (None,))[0] != key:
+        with open(path, "rb") as f:
+            mhtml = BytesParser(policy=policy.default).parse(f)
+        parts = [
+            p
+            for p in mhtml.walk()
+            if not p.is_multipart()
+            and p.get("Content-Transfer-Encoding", "").lower() == "base64"
+            and ("Content-Type" not in p or p.get_content_maintype() == "image")
+        ]
+        names = [
+            str(
+                p.get("Content-Location")
+                or p.get_filename()
+                or p.get("Content-ID")
+                or f"part {i + 1}"
+            ).rsplit("/", 1)[-1]
+            for i, p in enumerate(parts)
+        ]
+        APP.mhtml_cache = (key, names, parts)
+    _, names, parts = APP.mhtml_cache
+    APP.info["Names"] = names
+    if not parts:
         raise ValueError(f"No image found in {path}")
-    LOG.debug(
-        "%s",
-        f"Getting image {1 + APP.i_zip}/{len(new_parts)} of {len(parts)} parts: {APP.info['Names'][APP.i_zip]}",
-    )
-    data = new_parts[APP.i_zip]
+    LOG.debug("Getting image %s/%s: %s", 1 + APP.i_zip, len(parts), names[APP.i_zip])
+    data = parts[APP.i_zip].get_payload(decode=True)
     try:
-        im_file = BytesIO(base64.standard_b64decode(data.rstrip()))
-        APP.im = Image.open(im_file)
+        APP.im = Image.open(BytesIO(data))
     except (Image.UnidentifiedImageError, ValueError) as ex:
         LOG.error("MHT %s", ex)
-        LOG.error("DATA %r", data[:180])
-        im_file.seek(0)
-        LOG.error("DECODED %s", im_file.read()[:80])
-        # im_file.seek(0)
+        LOG.error("DECODED %s", data[:80])
         # https://github.com/fdintino/pillow-avif-plugin/issues/13
         # with open(f"tiv_mhtml_image_{1 + APP.i_zip}_fail.avif", "wb") as f:
-        #     f.write(im_file.read())
+        #     f.write(data)
         ex.args = (f"Failed to load image {1 + APP.i_zip} of",)
         raise ex
 
 
 def load_svg(fpath):
     """Load an SVG file."""
-    if fpath.suffix == ".svgz":  # NOSONAR
-        with gzip.open(fpath, "rt", encoding="utf8") as f:
-            data = f.read()
-    else:
-        with open(fpath, "r", encoding="utf8") as fp:
-            data = fp.read()
-
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
+    import pygame  # pylint:disable=import-outside-toplevel  # Slow to import; only for SVG.
+
+    # Raw bytes go to pygame as is; only the root tag needs decoding.
+    opener = gzip.open if fpath.suffix == ".svgz" else open
+    with opener(fpath, "rb") as f:
+        data = f.read()
+
+    # Only scan the root tag, not the path data.
+    start = data.find(b"<svg")
+    end = data.find(b">", start) + 1 if start >= 0 else 0
+    head = data[start:end].decode("utf8")
+    attrs = {k.lower(): v for k, v in SVG_ATTRS_RE.findall(head)}
     size = None
     try:
-        size = [
-            round(float(v))
-            for v in re.split(
-                "[, ]+",
-                re.findall(
-                    r'viewbox\s*=\s*"([, 0-9.]+)"', data, re.DOTALL | re.IGNORECASE
-                )[0],
-            )
-        ][2:]
-    except IndexError:
+        size = [round(float(v)) for v in attrs["viewbox"].replace(",", " ").split()][2:]
+    except (KeyError, ValueError):
         pass
     try:
-        size = [
-            round(
-                float(re.findall(rf'<svg [^>]*?{k}\s*=\s*"([0-9.]+)"[^>]*>', data)[0])
-            )
-            for k in ("width", "height")
-        ]
-    except IndexError:
+        size = [round(float(attrs[k])) for k in ("width", "height")]
+    except (KeyError, ValueError):
         pass
     if size:
         r = get_fit_ratio(*size)
-        data = re.sub(
-            "<svg([^>]+)>",
-            f'<svg \\1 width="{size[0]*r}" height="{size[1]*r}" transform="scale({r})">',
-            data,
-        )
+        head = f'<svg {head[4:-1]} width="{size[0]*r}" height="{size[1]*r}" transform="scale({r})">'
+        data = data[:start] + head.encode() + data[end:]
 
-    surface = pygame.image.load(BytesIO(data.encode()))
-    bf = BytesIO()
-    pygame.image.save(surface, bf, "png")
-    APP.im = Image.open(bf)
+    surface = pygame.image.load(BytesIO(data))
+    # Raw pixels skip a PNG encode and decode.
+    APP.im = Image.frombytes(
+        "RGBA", surface.get_size(), pygame.image.tobytes(surface, "RGBA")
+    )
 
 
 def load_zip(path):
     """Load a zip file."""
-    with zipfile.ZipFile(path, "r") as zf:
-        names = zf.namelist()
-        APP.info["Names"] = names
-        LOG.debug("Loading name index %s", APP.i_zip)
-        # pylint: disable=consider-using-with
-        APP.im = Image.open(zf.open(names[APP.i_zip]))
+    # Keep the archive open while browsing it instead of rereading its directory.
+    key = (path, os.stat(path).st_mtime_ns)
+    if getattr(APP, "zip_cache", (None,))[0] != key:
+        if hasattr(APP, "zip_cache"):
+            APP.zip_cache[1].close()
+        zf = zipfile.ZipFile(path, "r")  # pylint: disable=consider-using-with
+        APP.zip_cache = (key, zf, zf.namelist())
+    _, zf, names = APP.zip_cache
+    APP.info["Names"] = names
+    LOG.debug("Loading name index %s", APP.i_zip)
+    # Read the member so the lazily decoded image doesn't need the archive open.
+    APP.im = Image.open(BytesIO(zf.read(names[APP.i_zip])))
 
 
 def im_load(path=None):
@@ -631,7 +761,11 @@ def im_load(path=None):
     err_msg = ""
     try:
         if path != "pasted":
-            set_stats(path)
+            APP.info = {}
+            APP.info_cache = (None, "")
+            # Stats are only shown in the info overlay, so info_toggle adds them.
+            if APP.showing not in ("", "help"):
+                set_stats(path)
             if path.suffix == ".zip":
                 load_zip(path)
             elif path.suffix in (".svg", ".svgz"):
@@ -639,7 +773,10 @@ def im_load(path=None):
             elif path.suffix in (".eml", ".mht", ".mhtml"):
                 load_mhtml(path)
             else:
-                APP.im = Image.open(path)
+                APP.im = im_prefetched(path) or Image.open(path)
+                if APP.showing not in ("", "help"):
+                    im_undraft()  # Info needs full Pixels and Colors.
+                im_draft()
         APP.im_frame = 0
         if hasattr(APP.im, "n_frames"):
             APP.info["Frames"] = APP.im.n_frames
@@ -651,6 +788,7 @@ def im_load(path=None):
         #         str(v)[:80] + "..." if len(str(v)) > 80 else v,
         #     )
         im_resize(APP.b_animate)
+        im_prefetch()
     # pylint: disable=W0718
     except (
         tkinter.TclError,
@@ -670,11 +808,102 @@ def im_load(path=None):
         raise
 
 
-def get_fit_ratio(im_w, im_h):
+def im_draft(im=None, win_size=None):
+    """Let JPEG decode at 1/2, 1/4, or 1/8 scale if that still fills the window."""
+    if im is None:
+        im = APP.im
+    if (
+        APP.fit in (Fits.ALL, Fits.BIG)
+        and APP.im_scale <= 1
+        and APP.showing in ("", "help")
+        and getattr(im, "n_frames", 1) == 1
+    ):
+        full_size = w, h = im.size
+        # Request the fitted size rather than the window so the unfitted side
+        # doesn't hold back the scale. Round up to match im_resize's check.
+        ratio = APP.im_scale * get_fit_ratio(w, h, win_size)
+        if ratio >= 1:
+            return
+        im.draft(None, (math.ceil(w * ratio), math.ceil(h * ratio)))
+        if im.size != full_size:
+            LOG.debug("Drafted %s of %s", im.size, full_size)
+            im.full_size = full_size  # type: ignore
+
+
+def im_prefetch():
+    """Decode the neighbouring images on a thread so browsing to them is quick."""
+    n = len(APP.paths)
+    neighbours = {APP.paths[(APP.i_path + d) % n] for d in (1, -1)}
+    neighbours.discard(APP.paths[APP.i_path])
+    for path in list(APP.prefetched):
+        if path not in neighbours:
+            APP.prefetched.pop(path)[1].cancel()
+    win_size = (APP.winfo_width(), APP.winfo_height())  # Tk isn't for threads.
+    for path in neighbours:
+        # Archives, documents and SVG have their own loaders.
+        if (
+            path in APP.prefetched
+            or path == "pasted"
+            or path.suffix
+            in (
+                ".eml",
+                ".mht",
+                ".mhtml",
+                ".svg",
+                ".svgz",
+                ".zip",
+            )
+        ):
+            continue
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        future = PREFETCHER.submit(im_prefetch_open, path, win_size)
+        APP.prefetched[path] = (mtime, future)
+
+
+def im_prefetch_open(path, win_size):
+    """Open, draft and decode an image off the Tk thread."""
+    im = Image.open(path)
+    im_draft(im, win_size)
+    im.load()
+    return im
+
+
+def im_prefetched(path):
+    """Return the prefetched image for path, unless it failed or went stale."""
+    mtime, future = APP.prefetched.pop(path, (None, None))
+    if future is None or future.cancel():
+        return None
+    try:
+        if os.stat(path).st_mtime_ns == mtime:
+            return future.result()
+    except Exception:  # pylint: disable=W0718  # Image.open reports it again.
+        pass
+    return None
+
+
+def im_redraft():
+    """Reload drafted image if the window outgrew its draft."""
+    if hasattr(APP.im, "full_size"):
+        w, h = APP.im.full_size
+        ratio = APP.im_scale * get_fit_ratio(w, h)
+        if w * ratio > APP.im.width or h * ratio > APP.im.height:
+            im_undraft()
+
+
+def im_undraft():
+    """Reload drafted image at full size."""
+    if hasattr(APP.im, "full_size"):
+        LOG.debug("Reloading full size %s", APP.im.full_size)
+        APP.im = Image.open(APP.paths[APP.i_path])
+
+
+def get_fit_ratio(im_w, im_h, win_size=None):
     """Get fit ratio."""
     ratio = 1.0
-    w = APP.winfo_width()
-    h = APP.winfo_height()
+    w, h = win_size or (APP.winfo_width(), APP.winfo_height())
     if (
         ((APP.fit == Fits.ALL) and (im_w != w or im_h != h))
         or ((APP.fit == Fits.BIG) and (im_w > w or im_h > h))
@@ -689,7 +918,7 @@ def im_fit(im):
     w, h = im.size
     ratio = get_fit_ratio(w, h)
     if ratio != 1.0:  # NOSONAR
-        im = im.resize((int(w * ratio), int(h * ratio)), APP.quality)
+        im = im_resample(im, (int(w * ratio), int(h * ratio)), APP.quality)
     return im
 
 
@@ -705,7 +934,7 @@ def im_scale(im):
             APP.im_scale = max(SCALE_MIN, min(APP.im_scale * 1.1, SCALE_MAX))
             im = im_scale(im)
         else:
-            im = APP.im.resize((new_w, new_h), APP.quality)
+            im = im_resample(im, (new_w, new_h), APP.quality)
     except MemoryError as ex:
         LOG.error("Out of memory. Scaling down. %s", ex)
         APP.im_scale = max(SCALE_MIN, min(APP.im_scale * 0.9, SCALE_MAX))
@@ -713,55 +942,178 @@ def im_scale(im):
     return im
 
 
+def im_reducing_gap(im) -> Optional[float]:
+    """Return REDUCING_GAP, unless Image.reduce can't handle the mode."""
+    # 16-bit grayscale PNG/TIFF open as I;16*, which reduce() rejects.
+    return None if im.mode.startswith("I;16") else REDUCING_GAP
+
+
+def im_resample(im, size, quality):
+    """Resize im, starting from a cached power-of-two box reduction of it."""
+    if min(size) < 1:
+        # reducing_gap would divide by zero before Pillow's size check.
+        return im.resize(size, quality)
+    factor = 1
+    # Pillow resizes these with NEAREST and no reduction, or can't reduce them.
+    if (
+        quality != Image.Resampling.NEAREST
+        and im.mode not in ("1", "P")
+        and im_reducing_gap(im)
+        and getattr(im, "n_frames", 1) == 1
+    ):
+        while min(im.width / size[0], im.height / size[1]) >= 2 * REDUCING_GAP * factor:
+            factor *= 2
+    if factor > 1:
+        # Zoom steps and window resizes keep reusing the same few levels.
+        if not hasattr(im, "pyramid"):
+            im.pyramid = {}  # type: ignore
+        if factor not in im.pyramid:
+            im.pyramid[factor] = im.reduce(factor)
+        im = im.pyramid[factor]
+    return im.resize(size, quality, reducing_gap=im_reducing_gap(im))
+
+
 def im_resize(loop=False):
     """Resize image."""
     if not (hasattr(APP, "im") and APP.im):
         return
 
-    im = APP.im.copy()  # Loses im.format!
+    loop = animation_stop() or loop
+    im_redraft()
 
-    if APP.fit:
-        im = im_fit(APP.im)
+    # Configure, toggles and hotkeys often ask for what is already shown.
+    key = im_resize_key()
+    if CANVAS.rendered_im is APP.im and CANVAS.rendered_key == key:
+        size = CANVAS.rendered_size
+        # Zoom reset and fit toggles also bring a dragged image back.
+        im_center()
+        scrollbars_set()
+    else:
+        im = APP.im  # Resize and transpose return new images.
+
+        # im_scale applies the fit ratio too, so only one of them resamples.
+        with IM_LOCK:  # A background resize may be decoding it.
+            if APP.im_scale != 1:
+                im = im_scale(im)
+            elif APP.fit:
+                im = im_fit(im)
 
-    if APP.im_scale != 1:
-        im = im_scale(APP.im)
+        size = im.size
 
-    if APP.transpose_type != -1:
-        LOG.debug("Transposing %s", Transpose(APP.transpose_type))
-        im = im.transpose(APP.transpose_type)
+        if APP.transpose_type != -1:
+            LOG.debug("Transposing %s", Transpose(APP.transpose_type))
+            im = im.transpose(APP.transpose_type)
+        elif im is APP.im and im.mode == "P":
+            im = im.copy()  # tkim_set moves its transparency into the palette.
 
-    im_show(im)
+        im_show(im)
+        CANVAS.rendered_im = APP.im
+        CANVAS.rendered_key = key
+        CANVAS.rendered_size = size
 
     if loop and hasattr(APP.im, "n_frames") and APP.im.n_frames > 1:
-        APP.im_frame = (APP.im_frame + 1) % APP.im.n_frames
-        try:
-            APP.im.seek(APP.im_frame)
-        except EOFError as ex:
-            LOG.error("IMAGE EOF. %s", ex)
-        duration = int(APP.info["duration"] or 100) if "duration" in APP.info else 100
-        if hasattr(APP, "animation"):
-            APP.after_cancel(APP.animation)
-        APP.animation = APP.after(duration, im_resize, APP.b_animate)
+        animation_start(size)
 
 
-def im_show(im):
-    """Show PIL image in Tk image widget."""
+def im_resize_apply(results: queue.Queue, im, key: tuple):
+    """Show the image resampled by im_resize_background once ready."""
+    if results is not APP.resize_results:
+        return
     try:
-        CANVAS.tkim: ImageTk.PhotoImage = ImageTk.PhotoImage(im)  # type: ignore
-        CANVAS.itemconfig(CANVAS.image_ref, image=CANVAS.tkim, anchor="center")
+        rendered = results.get_nowait()
+    except queue.Empty:
+        APP.after(10, im_resize_apply, results, im, key)
+        return
+    APP.resize_results = None
+    # A browse, zoom or newer resize has taken over.
+    if im is not APP.im or key != im_resize_key():
+        return
+    if rendered is None:
+        im_resize()  # Report the error the usual way.
+    elif not (CANVAS.rendered_im is im and CANVAS.rendered_key == key):
+        im_show(rendered[0])
+        CANVAS.rendered_im = im
+        CANVAS.rendered_key = key
+        CANVAS.rendered_size = rendered[1]
+
+
+def im_resize_background():
+    """Fit a still image to the new window size without blocking Tk."""
+    APP.resize_timer = None
+    if not (hasattr(APP, "im") and APP.im):
+        return
+    if APP.im_scale != 1 or not APP.fit or getattr(APP.im, "n_frames", 1) > 1:
+        im_resize()  # Zoom and animations keep the direct path.
+        return
+    im_redraft()
+    key = im_resize_key()
+    if CANVAS.rendered_im is APP.im and CANVAS.rendered_key == key:
+        return
+    im = APP.im
+    w, h = im.size
+    ratio = get_fit_ratio(w, h)
+    size = (int(w * ratio), int(h * ratio)) if ratio != 1.0 else None  # NOSONAR
+    results: queue.Queue = queue.Queue()
+    APP.resize_results = results  # Only the latest request gets shown.
+    threading.Thread(
+        target=im_resize_worker,
+        args=(im, size, APP.quality, APP.transpose_type, results),
+        daemon=True,
+    ).start()
+    APP.after(10, im_resize_apply, results, im, key)
+
+
+def im_resize_key() -> tuple:
+    """Return what the shown render depends on besides the image."""
+    return (
+        APP.im_frame,
+        APP.winfo_width(),
+        APP.winfo_height(),
+        APP.fit,
+        APP.im_scale,
+        APP.quality,
+        APP.transpose_type,
+    )
 
-        try:
-            rw, rh = APP.winfo_width(), APP.winfo_height()
-            x, y, x2, y2 = CANVAS.bbox(CANVAS.image_ref)
-            w = x2 - x
-            h = y2 - y
-            good_x = rw // 2 - w // 2
-            good_y = rh // 2 - h // 2
-            # canvas.move(canvas.image_ref, -x + canvas.winfo_width() // 2, -y + canvas.winfo_height() // 2)
-            CANVAS.move(CANVAS.image_ref, good_x - x, good_y - y)
-        except TypeError as ex:
-            LOG.error(ex)
 
+def im_resize_worker(im, size, quality, transpose_type, results: queue.Queue):
+    """Load, resample and transpose im for im_resize_apply."""
+    try:
+        with IM_LOCK:  # The Tk thread may load or read it meanwhile.
+            im.load()
+            if size:
+                im = im_resample(im, size, quality)
+            elif transpose_type == -1 and im.mode == "P":
+                im = im.copy()  # tkim_set moves its transparency into the palette.
+        size = im.size
+        if transpose_type != -1:
+            im = im.transpose(transpose_type)
+        results.put((im, size))
+    except Exception as ex:  # pylint: disable=W0718  # im_resize reports it.
+        LOG.debug("Background resize failed: %s", ex)
+        results.put(None)
+
+
+def im_center():
+    """Center image in window."""
+    try:
+        rw, rh = APP.winfo_width(), APP.winfo_height()
+        x, y, x2, y2 = CANVAS.bbox(CANVAS.image_ref)
+        w = x2 - x
+        h = y2 - y
+        good_x = rw // 2 - w // 2
+        good_y = rh // 2 - h // 2
+        # canvas.move(canvas.image_ref, -x + canvas.winfo_width() // 2, -y + canvas.winfo_height() // 2)
+        CANVAS.move(CANVAS.image_ref, good_x - x, good_y - y)
+    except TypeError as ex:
+        LOG.error(ex)
+
+
+def im_show(im):
+    """Show PIL image in Tk image widget."""
+    try:
+        tkim_set(im)
+        im_center()
         ERROR_OVERLAY.lower()
     except MemoryError as ex:
         LOG.error("Out of memory. Scaling down. %s", ex)
@@ -774,7 +1126,7 @@ def im_show(im):
         else ""
     )
     msg = (
-        f"{APP.i_path+1}/{len(APP.paths)}{zip_info} {'%sx%s' % APP.im.size}"
+        f"{APP.i_path+1}/{len(APP.paths)}{zip_info} {'%sx%s' % getattr(APP.im, 'full_size', APP.im.size)}"
         f" @ {'%sx%s' % im.size} {APP.paths[APP.i_path]}"
     )
     APP.title(msg + " - " + TITLE)
@@ -786,27 +1138,70 @@ def im_show(im):
     ):
         APP.i_path_old = APP.i_path
         APP.i_zip_old = APP.i_zip
-        CANVAS.config(cursor="watch")
-        info_set(msg + info_get(APP.im, APP.info, APP.paths[APP.i_path]))
-        CANVAS.config(cursor="")
+        # Let the new image paint before the slower metadata is gathered.
+        APP.after_idle(info_update, msg, APP.im)
     scrollbars_set()
 
 
+def tkim_show(tkim):
+    """Show an existing Tk image, leaving it out of tkim_set's reuse."""
+    CANVAS.tkim = tkim
+    CANVAS.tkim_layout = None
+    CANVAS.itemconfig(CANVAS.image_ref, image=tkim)
+
+
+def tkim_set(im):
+    """Put PIL image on canvas, reusing the Tk image if it has the same layout."""
+    if im.mode == "P":
+        # Like PhotoImage does on creation, which paste() doesn't. Moves the
+        # transparency into the palette in place, so pass an image you own.
+        im.apply_transparency()
+    layout = (im.size, im.mode, im.palette.mode if im.palette else "")
+    if CANVAS.tkim_layout == layout:
+        CANVAS.tkim.paste(im)
+        return
+    CANVAS.tkim: ImageTk.PhotoImage = ImageTk.PhotoImage(im)  # type: ignore
+    CANVAS.tkim_layout = layout
+    CANVAS.itemconfig(CANVAS.image_ref, image=CANVAS.tkim, anchor="center")
+
+
+def info_text(im, path) -> str:
+    """Return image info, reused while the same image is shown."""
+    if APP.info_cache[0] is not im:
+        with IM_LOCK:  # Animation may have started.
+            APP.info_cache = (im, info_get(im, APP.info, path, exiftool=False))
+    return APP.info_cache[1]
+
+
 def info_toggle(event=None):
     """Toggle info overlay."""
     if APP.showing in ("", "help"):
         CANVAS.config(cursor="watch")
-        info_set(
-            APP.title()[: -len(" - " + TITLE)]
-            + info_get(APP.im, APP.info, APP.paths[APP.i_path])
-        )
-        LOG.debug("Showing info:\n%s", CANVAS.itemcget(CANVAS.text, "text"))
+        im_undraft()
+        path = APP.paths[APP.i_path]
+        if path != "pasted" and "Size" not in APP.info:
+            set_stats(path)
+        info_set(APP.title()[: -len(" - " + TITLE)] + info_text(APP.im, path))
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("Showing info:\n%s", CANVAS.itemcget(CANVAS.text, "text"))
         info_show()
         CANVAS.config(cursor="")
+        exiftool_append(path)
     else:
         info_hide()
 
 
+def info_update(msg: str, im):
+    """Fill the info overlay for the shown image, unless browsed on or hidden."""
+    if im is not APP.im or APP.showing in ("", "help"):
+        return
+    CANVAS.config(cursor="watch")
+    path = APP.paths[APP.i_path]
+    info_set(msg + info_text(im, path))
+    CANVAS.config(cursor="")
+    exiftool_append(path)
+
+
 def info_show():
     """Show info overlay."""
     CANVAS.lift(CANVAS.text_bg)
@@ -825,23 +1220,10 @@ def info_hide():
 def menu_init():
     """Creates the context menu."""
     for fun, keys in BINDS:
-        if fun in (
-            browse_frame,
-            browse_percentage,
-            browse_mouse,
-            drag,
-            drag_begin,
-            drag_end,
-            menu_show,
-            resize_handler,
-            scroll,
-            select,
-            zoom,
-            zoom_text,
-        ):
+        if fun in MENU_SKIP:
             continue
         lbl = fun.__doc__[:-1].title()
-        if re.match("[a-z]( |$)", keys):
+        if SINGLE_KEY_RE.match(keys):
             MENU.add_command(
                 label=lbl + f" ({keys[0].upper()})", command=fun, underline=len(lbl) - 2
             )
@@ -854,9 +1236,12 @@ def menu_show(event):
     MENU.post(event.x_root, event.y_root)
 
 
+@functools.lru_cache(maxsize=4096)
 def natural_sort(s: str):
     """Sort by number and string."""
-    return [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", str(s))]
+    parts = NUMBERS_RE.split(str(s).lower())
+    parts[1::2] = map(int, parts[1::2])  # The split captures numbers at odd indexes.
+    return tuple(parts)
 
 
 @log_this
@@ -886,6 +1271,8 @@ def path_save(event=None, filename=None, newmode=None, noexif=False):
     if not filename:
         return
     LOG.info("Saving %s", filename)
+    animation_stop()  # Saving seeks frames.
+    im_undraft()
     im = APP.im.convert(newmode) if newmode else APP.im
     save_all = hasattr(im, "n_frames") and im.n_frames > 1
     fmt = filename.split(".")[-1].upper()
@@ -934,6 +1321,15 @@ def path_save(event=None, filename=None, newmode=None, noexif=False):
         raise
 
 
+def path_stat(path) -> os.stat_result:
+    """Stat path once per directory read."""
+    stats = APP.path_stats.get(path)
+    if stats is None:
+        entry = APP.path_entries.get(path)
+        stats = APP.path_stats[path] = entry.stat() if entry else os.stat(path)
+    return stats
+
+
 def paths_sort(path=None):
     """Sort paths."""
     LOG.debug("Sorting %s", APP.sort)
@@ -947,13 +1343,13 @@ def paths_sort(path=None):
         if s == "natural":
             APP.paths.sort(key=natural_sort)
         elif s == "ctime":
-            APP.paths.sort(key=os.path.getmtime)
+            APP.paths.sort(key=lambda p: path_stat(p).st_mtime)
         elif s == "mtime":
-            APP.paths.sort(key=os.path.getmtime)
+            APP.paths.sort(key=lambda p: path_stat(p).st_mtime)
         elif s == "random":
             random.shuffle(APP.paths)
         elif s == "size":
-            APP.paths.sort(key=os.path.getsize)
+            APP.paths.sort(key=lambda p: path_stat(p).st_size)
         elif s == "string":
             APP.paths.sort()
 
@@ -970,14 +1366,57 @@ def paths_sort(path=None):
 
 def paths_update(event=None, path=None):
     """Update path info."""
-    if not path:
-        path = APP.paths[APP.i_path]
+    results: queue.Queue = queue.Queue()
+    APP.paths_results = results  # Only the latest scan gets applied.
+    threading.Thread(
+        target=paths_scan,
+        args=(path or APP.paths[APP.i_path], APP.sort, results),
+        daemon=True,
+    ).start()
+    paths_apply(path, results)
+
+
+def paths_scan(path, sort: str, results: queue.Queue):
+    """List directory off the UI thread."""
+    try:
+        p = pathlib.Path(path)
+        if not p.is_dir():
+            p = p.parent
+        LOG.debug("Reading %s...", p)
+        # DirEntry reuses directory listing data for stat where the OS provides it.
+        with os.scandir(p) as it:
+            entries = {pathlib.Path(e.path): e for e in it}
+        if {"ctime", "mtime", "size"}.intersection(sort.split(",")):
+            if len(entries) > 500:
+                # Network drives answer many stats in parallel. The GIL is
+                # released during the syscall.
+                with ThreadPoolExecutor(max_workers=32) as pool:
+                    list(pool.map(os.DirEntry.stat, entries.values()))
+            else:
+                for e in entries.values():
+                    e.stat()  # Cached in the DirEntry.
+        results.put(entries)
+    except OSError as ex:
+        results.put(ex)
+
 
-    p = pathlib.Path(path)
-    if not p.is_dir():
-        p = p.parent
-    LOG.debug("Reading %s...", p)
-    APP.paths = list(p.glob("*"))
+def paths_apply(path, results: queue.Queue):
+    """Use scanned paths once ready."""
+    if results is not APP.paths_results:
+        return
+    try:
+        entries = results.get_nowait()
+    except queue.Empty:
+        APP.after(10, paths_apply, path, results)
+        return
+    if isinstance(entries, OSError):
+        error_show(f"paths_update {type(entries).__name__}: {entries}")
+        return
+    if not path:  # Keep the file browsed to while scanning.
+        path = APP.paths[APP.i_path] if APP.paths else None
+    APP.path_entries = entries
+    APP.paths = list(entries)
+    APP.path_stats = {}
     LOG.debug("Found %s files.", len(APP.paths))
     LOG.debug("Filter?")
     paths_sort(path)
@@ -985,16 +1424,32 @@ def paths_update(event=None, path=None):
 
 def refresh_loop():
     """Autoupdate paths."""
+    APP.path_updater = None
     if APP.update_interval > 0:
-        paths_update()
-        if hasattr(APP, "path_updater"):
-            APP.after_cancel(APP.path_updater)
+        # Names only change with the folder's mtime; the shown file and stat
+        # sorts can change without it.
+        path = pathlib.Path(APP.paths[APP.i_path])
+        try:
+            key = (os.stat(path.parent).st_mtime_ns, os.stat(path).st_mtime_ns)
+        except OSError:
+            key = None
+        if (
+            key is None
+            or key != APP.paths_key
+            or {"ctime", "mtime", "size"}.intersection(APP.sort.split(","))
+        ):
+            APP.paths_key = key
+            paths_update()
         APP.path_updater = APP.after(APP.update_interval, refresh_loop)
 
 
 def refresh_toggle(event=None):
     """Toggle autoupdate."""
     APP.update_interval = -APP.update_interval
+    # Cancel a pending tick so toggling back on cannot start a second loop.
+    if APP.path_updater:
+        APP.after_cancel(APP.path_updater)
+        APP.path_updater = None
     if APP.update_interval > 0:
         toast(f"Refreshing every {APP.update_interval/1000:.2}s.")
         refresh_loop()
@@ -1002,43 +1457,53 @@ def refresh_toggle(event=None):
         toast("Refresh off.")
 
 
-def resize_handler(event=None):
-    """Handle Tk resize event."""
-    new_size = APP.winfo_geometry().split("+", maxsplit=1)[0]
-    if APP.s_geo == new_size:
+def resize_apply():
+    """Apply window size to overlays, image and scrollbars."""
+    APP.b_resize_pending = False
+    w = APP.winfo_width()
+    h = APP.winfo_height()
+    if (w, h) == (APP.w, APP.h):
         return
-    APP.w = APP.winfo_width()
-    APP.h = APP.winfo_height()
-    ERROR_OVERLAY.config(wraplength=APP.w)
-    TOAST.config(wraplength=APP.w)
-    CANVAS.itemconfig(CANVAS.text, width=APP.w - 16)
+    APP.h = h
+    # Height-only changes don't affect text wrapping.
+    rewrapped = w != APP.w
+    if rewrapped:
+        APP.w = w
+        ERROR_OVERLAY.config(wraplength=w)
+        TOAST.config(wraplength=w)
+        CANVAS.itemconfig(CANVAS.text, width=w - 16)
     CANVAS.coords(CANVAS.im_bg, 0, 0, APP.w, APP.h)
     # Resize selection?
 
-    bb = CANVAS.bbox(CANVAS.text)
-    if bb != CANVAS.bbox(CANVAS.text):
-        info_bg_update()
+    if APP.showing and rewrapped:
+        bb = CANVAS.bbox(CANVAS.text)
+        if bb != CANVAS.text_bb:
+            info_bg_update(bb)
 
     if APP.fit:
-        im_resize()
+        # Resample once the window stops changing size, not on every step.
+        if APP.resize_timer:
+            APP.after_cancel(APP.resize_timer)
+        APP.resize_timer = APP.after(RESIZE_DELAY, im_resize_background)
 
     scrollbars_set()
 
-    APP.s_geo = new_size
+
+def resize_handler(event=None):
+    """Handle Tk resize event."""
+    # Root bindings also fire for child widgets, e.g. toast and scrollbar layout.
+    if event and event.widget is not APP:
+        return
+    # Coalesce the Configure flood of a live resize into one pass per idle cycle.
+    if not APP.b_resize_pending:
+        APP.b_resize_pending = True
+        APP.after_idle(resize_apply)
 
 
 def scroll(event):
     """Scroll."""
-    k = event.keysym
-    if k == "Left":
-        CANVAS.xview_scroll(-1, "units")
-    elif k == "Right":
-        CANVAS.xview_scroll(1, "units")
-        LOG.debug("After scrolling 10 px, xvieww returns: %s", CANVAS.xview())
-    if k == "Up":
-        CANVAS.yview_scroll(-1, "units")
-    elif k == "Down":
-        CANVAS.yview_scroll(1, "units")
+    view_scroll, units = SCROLL_KEYS[event.keysym]
+    view_scroll(CANVAS, units, "units")
 
 
 @log_this
@@ -1054,68 +1519,54 @@ def scrollbars_set():
     win_w = APP.winfo_width()
     try:
         x, y, x2, y2 = CANVAS.bbox(CANVAS.image_ref, CANVAS.text)
-        can_w = x2 - x
-        can_h = y2 - y
-        show_v = max(0, y) + can_h > win_h
-        # Vertical scrollbar causing horizontal scrollbar.
-        show_h = max(0, x) + can_w > win_w - 16 * show_v
-        # Horizontal scrollbar causing vertical scrollbar.
-        show_v = max(0, y) + can_h > win_h - 16 * show_h
-        if show_h:
-            can_h += 16
-            SCROLLX.place(
-                x=0,
-                y=1,
-                width=win_w,
-                relx=0,
-                rely=1,
-                anchor="sw",
-                bordermode="outside",
-            )
-            SCROLLX.lift()
-        else:
-            SCROLLX.lower()
-
-        if show_v:
-            can_w += 16
-            SCROLLY.place(
-                x=1,
-                y=0,
-                height=win_h,
-                relx=1,
-                rely=0,
-                anchor="ne",
-                bordermode="outside",
-            )
-            SCROLLY.lift()
-        else:
-            SCROLLY.lower()
-
-        if show_h and show_v:
-            SCROLLX.place(
-                x=0,
-                y=1,
-                width=win_w - 16,
-                relx=0,
-                rely=1,
-                anchor="sw",
-                bordermode="outside",
-            )
-            SCROLLY.place(
-                x=1,
-                y=0,
-                height=win_h - 16,
-                relx=1,
-                rely=0,
-                anchor="ne",
-                bordermode="outside",
-            )
-            GRIP.lift()
-        else:
-            GRIP.lower()
+        # Zoom steps at the limits, scroll keys and idle rechecks change nothing.
+        key = (x, y, x2, y2, win_w, win_h)
+        if key != APP.scroll_key:
+            APP.scroll_key = key
+            can_w = x2 - x
+            can_h = y2 - y
+            right = max(0, x) + can_w
+            bottom = max(0, y) + can_h
+            # Either scrollbar takes 16 px that can make the other one needed.
+            show_h = right > win_w or (right > win_w - 16 and bottom > win_h)
+            show_v = bottom > win_h or (bottom > win_h - 16 and right > win_w)
+            if show_h:
+                can_h += 16
+                SCROLLX.place(
+                    x=0,
+                    y=1,
+                    width=win_w - 16 * show_v,
+                    relx=0,
+                    rely=1,
+                    anchor="sw",
+                    bordermode="outside",
+                )
+                SCROLLX.lift()
+            else:
+                SCROLLX.lower()
+
+            if show_v:
+                can_w += 16
+                SCROLLY.place(
+                    x=1,
+                    y=0,
+                    height=win_h - 16 * show_h,
+                    relx=1,
+                    rely=0,
+                    anchor="ne",
+                    bordermode="outside",
+                )
+                SCROLLY.lift()
+            else:
+                SCROLLY.lower()
 
-        scrollregion = (min(x, 0), min(y, 0), x + can_w, y + can_h)
-        CANVAS.config(scrollregion=scrollregion)
+            if show_h and show_v:
+                GRIP.lift()
+            else:
+                GRIP.lower()
+
+            scrollregion = (min(x, 0), min(y, 0), x + can_w, y + can_h)
+            CANVAS.config(scrollregion=scrollregion)
         if not APP.scroll_locked and APP.i_path != APP.i_scroll:
             # Scroll to top for comics.
             CANVAS.xview_moveto(0)
@@ -1150,9 +1601,8 @@ def set_bg(event=None):
 @log_this
 def set_order(event=None):
     """Set order."""
-    i = SORTS.index(APP.sort) if APP.sort in SORTS else -1
-    i = (i + 1) % len(SORTS)
-    APP.sort = SORTS[i]
+    APP.i_sort = (APP.i_sort + 1) % len(SORTS)
+    APP.sort = SORTS[APP.i_sort]
     s = "Sort: " + APP.sort
     LOG.info(s)
     toast(s)
@@ -1161,23 +1611,25 @@ def set_order(event=None):
 
 def set_stats(path):
     """Set stats."""
-    stats = os.stat(path)
+    stats = path_stat(path)
     APP.info = {
         # "Path": pathlib.Path(path),
         "Size": f"{stats.st_size:,} B",
-        "Created": time.strftime(
-            TIME_FORMAT,
-            time.localtime(
-                stats.st_birthtime if hasattr(stats, "st_birthtime") else stats.st_ctime
-            ),
-        ),
-        "Modified": time.strftime(TIME_FORMAT, time.localtime(stats.st_mtime)),
-        "Accessed": time.strftime(TIME_FORMAT, time.localtime(stats.st_atime)),
+        "Created": timestamp_format(getattr(stats, "st_birthtime", stats.st_ctime)),
+        "Modified": timestamp_format(stats.st_mtime),
+        "Accessed": timestamp_format(stats.st_atime),
+        **APP.info,
     }
 
 
 def set_supported_files():
     """Set supported files."""
+    APP.SUPPORTED_FILES_READ, APP.SUPPORTED_FILES_WRITE = supported_files()
+
+
+@functools.cache
+def supported_files():
+    """Return file dialog types to read and write."""
     exts = Image.registered_extensions()
     exts[".eml"] = "MHTML"
     exts[".mht"] = "MHTML"
@@ -1187,62 +1639,53 @@ def set_supported_files():
     exts[".zip"] = "ZIP"
     added_exts = ["EML", "MHT", "MHTML", "SVG", "SVGZ", "ZIP"]
 
-    type_exts = {}
-    for k, v in exts.items():
+    type_exts: dict = {}
+    open_exts = []
+    save_exts = []
+    save_all_exts = []
+    # Sorted once so the buckets below come out in order.
+    sorted_exts = sorted(exts.items())
+    for k, v in sorted_exts:
         type_exts.setdefault(v, []).append(k)
-
-    APP.SUPPORTED_FILES_READ = [
-        (
-            "All supported files",
-            " ".join(
-                sorted(list(k for k, v in exts.items() if v in Image.OPEN) + added_exts)
-            ),
-        ),
+        if v in Image.OPEN:
+            open_exts.append(k)
+        if v in Image.SAVE:
+            save_exts.append(k)
+        if v in Image.SAVE_ALL:
+            save_all_exts.append(k)
+
+    read = [
+        ("All supported files", " ".join(sorted(open_exts + added_exts))),
         ("All files", "*"),
         ("Archives", ".eml .mht .mhtml .zip"),
         *sorted(
             (k, v) for k, v in type_exts.items() if k in Image.OPEN or k in added_exts
         ),
     ]
-    APP.SUPPORTED_FILES_WRITE = [
-        (
-            "All supported files",
-            " ".join(sorted(list(k for k, v in exts.items() if v in Image.SAVE))),
-        ),
+    write = [
+        ("All supported files", " ".join(save_exts)),
         *sorted((k, v) for k, v in type_exts.items() if k in Image.SAVE),
     ]
 
-    LOG.debug("Supports %s", ", ".join(s[1:].upper() for s in sorted(list(exts))))
-    LOG.debug(
-        "Open: %s",
-        ", ".join(
-            sorted(
-                [k[1:].upper() for k, v in exts.items() if v in Image.OPEN] + added_exts
-            )
-        ),
-    )
-    LOG.debug(
-        "Save: %s",
-        ", ".join(sorted(k[1:].upper() for k, v in exts.items() if v in Image.SAVE)),
-    )
-    LOG.debug(
-        "Save all frames: %s",
-        ", ".join(
-            sorted(k[1:].upper() for k, v in exts.items() if v in Image.SAVE_ALL)
-        ),
-    )
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug("Supports %s", ", ".join(k[1:].upper() for k, _ in sorted_exts))
+        LOG.debug(
+            "Open: %s",
+            ", ".join(sorted([k[1:].upper() for k in open_exts] + added_exts)),
+        )
+        LOG.debug("Save: %s", ", ".join(k[1:].upper() for k in save_exts))
+        LOG.debug(
+            "Save all frames: %s", ", ".join(k[1:].upper() for k in save_all_exts)
+        )
+    return read, write
 
 
 def quality_set(event=None):
     """Set resize quality."""
-    i = RESIZE_QUALITY.index(APP.quality)
-    i += -1 if event and event.keysym == "Q" else 1
-    if i >= len(RESIZE_QUALITY):
-        i = 0
-    if i < 0:
-        i = len(RESIZE_QUALITY) - 1
-    APP.quality = RESIZE_QUALITY[i]
-    toast(f"Quality: {Image.Resampling(APP.quality).name}")
+    APP.i_quality += -1 if event and event.keysym == "Q" else 1
+    APP.i_quality %= len(RESIZE_QUALITY)
+    APP.quality = RESIZE_QUALITY[APP.i_quality]
+    toast(f"Quality: {APP.quality.name}")
     im_resize()
 
 
@@ -1267,26 +1710,65 @@ def slideshow_run(event=None):
             browse(delta=1)
         except (Image.UnidentifiedImageError, PermissionError):
             pass
-        APP.after(APP.slideshow_pause, slideshow_run)
+        # Aim at the next deadline so load times don't add up as drift.
+        APP.slideshow_deadline += APP.slideshow_pause / 1000
+        ms = int((APP.slideshow_deadline - time.monotonic()) * 1000)
+        if ms < 1:
+            APP.slideshow_deadline = time.monotonic()
+            ms = 1
+        APP.slideshow_timer = APP.after(ms, slideshow_run)
 
 
 def slideshow_toggle(event=None):
     """Toggle slideshow."""
     APP.b_slideshow = not APP.b_slideshow
+    if APP.slideshow_timer:
+        APP.after_cancel(APP.slideshow_timer)
+        APP.slideshow_timer = None
     if APP.b_slideshow:
         toast("Starting slideshow.")
-        APP.after(APP.slideshow_pause, slideshow_run)
+        APP.slideshow_deadline = time.monotonic() + APP.slideshow_pause / 1000
+        APP.slideshow_timer = APP.after(APP.slideshow_pause, slideshow_run)
     else:
         toast("Stopping slideshow.")
 
 
+@functools.lru_cache(maxsize=1024)
+def timestamp_format(t: float) -> str:
+    """Format a file time, cached as browsing revisits files."""
+    return time.strftime(TIME_FORMAT, time.localtime(t))
+
+
 def toast(msg: str, ms: int = 2000, fg="#00FF00"):
     """Temporarily show a status message."""
-    TOAST.config(text=msg, fg=fg)
+    # Repeats of the shown message keep their text; an error may cover it though.
+    if not APP.b_toast_pending or (msg, fg) != APP.toast_shown:
+        APP.toast_shown = (msg, fg)
+        TOAST.config(text=msg, fg=fg)
     TOAST.lift()
-    if hasattr(APP, "toast_timer"):
-        APP.after_cancel(APP.toast_timer)
-    APP.toast_timer = APP.after(ms, TOAST.lower)
+    # Extend the running timer instead of recreating it on every message.
+    APP.toast_expiry = time.monotonic() + ms / 1000
+    if not APP.b_toast_pending or APP.toast_expiry < APP.toast_due:
+        if APP.b_toast_pending:  # A shorter message shouldn't wait on a longer one.
+            APP.after_cancel(APP.toast_timer)
+        APP.b_toast_pending = True
+        toast_schedule(ms)
+
+
+def toast_hide():
+    """Hide status message once it expires."""
+    left_ms = int((APP.toast_expiry - time.monotonic()) * 1000)
+    if left_ms > 0:
+        toast_schedule(left_ms)
+    else:
+        APP.b_toast_pending = False
+        TOAST.lower()
+
+
+def toast_schedule(ms: int):
+    """Hide status message after ms unless extended."""
+    APP.toast_due = time.monotonic() + ms / 1000
+    APP.toast_timer = APP.after(ms, toast_hide)
 
 
 @log_this
@@ -1299,7 +1781,7 @@ def transpose_set(event=None):
         APP.transpose_type = len(Transpose) - 1
 
     if APP.transpose_type >= 0:
-        toast(f"Transpose: {Transpose(APP.transpose_type).name}")
+        toast(f"Transpose: {TRANSPOSE_NAMES[APP.transpose_type]}")
     else:
         toast("Transpose: Normal")
     im_resize()
@@ -1335,12 +1817,6 @@ def fullscreen_toggle(event=None):
     resize_handler()
 
 
-def str2float(s: str) -> float:
-    """Python lacks a parse function for "13px"."""
-    m = re.match("\\d+", s)
-    return float(m.group(0)) if m else 0.0
-
-
 def zoom(event):
     """Zoom."""
     k = event.keysym
@@ -1348,13 +1824,18 @@ def zoom(event):
         k = "plus"
     if event.num == 4 or event.delta < 0:
         k = "minus"
-    if k in ("plus", "equal"):
-        APP.im_scale *= 1.1
-    elif k == "minus":
-        APP.im_scale *= 0.9
-    else:
-        APP.im_scale = 1
+    factor = ZOOM_FACTORS.get(k)
+    APP.im_scale = APP.im_scale * factor if factor else 1
     APP.im_scale = max(SCALE_MIN, min(APP.im_scale, SCALE_MAX))
+    # A fast wheel spin resamples once for the combined scale.
+    if not APP.b_zoom_pending:
+        APP.b_zoom_pending = True
+        APP.after(ZOOM_DELAY, zoom_apply)
+
+
+def zoom_apply():
+    """Resize image for the zoom scale reached."""
+    APP.b_zoom_pending = False
     im_resize()
 
 
@@ -1366,16 +1847,16 @@ def zoom_text(event):
         k = "plus"
     if event.num == 4 or event.delta < 0:
         k = "minus"
-    if k in ("plus", "equal"):
-        APP.f_text_scale *= 1.1
-    elif k == "minus":
-        APP.f_text_scale *= 0.9
-    else:
-        APP.f_text_scale = 1
+    factor = ZOOM_FACTORS.get(k)
+    APP.f_text_scale = APP.f_text_scale * factor if factor else 1
     APP.f_text_scale = max(0.1, min(APP.f_text_scale, 20))
     new_font_size = int(FONT_SIZE * APP.f_text_scale)
     new_font_size = max(1, min(new_font_size, 200))
     LOG.info("Text scale: %s New font size: %s", APP.f_text_scale, new_font_size)
+    # Wheel bursts at the scale limits or within one point change nothing.
+    if new_font_size == APP.i_font_size:
+        return
+    APP.i_font_size = new_font_size
 
     ERROR_OVERLAY.config(font=("Consolas", new_font_size))
     TOAST.config(font=("Consolas", new_font_size * 2))
@@ -1408,9 +1889,18 @@ CANVAS = tkinter.Canvas(bg="blue", borderwidth=0, highlightthickness=0, relief="
 # Opening the context menu only triggers drag_end.
 CANVAS.dragx = 0  # type: ignore
 CANVAS.dragy = 0  # type: ignore
-CANVAS.lines = []  # type: ignore
+CANVAS.drag_pending = None  # type: ignore
+# Windows sucks at dashed lines. https://tcl.tk/man/tcl8.5/TkCmd/canvas.htm#M18
+CANVAS.lines = [  # type: ignore
+    CANVAS.create_line(0, 0, 0, 0, fill=fill, dash=dash, state="hidden", tags="lines")
+    for fill, dash in [("white", (6, 4)), ("black", (2, 4))] * 2
+]
+CANVAS.rendered_im = None  # type: ignore
+CANVAS.tkim_layout = None  # type: ignore
 CANVAS.place(x=0, y=0, relwidth=1, relheight=1)
 CANVAS.text_bg = CANVAS.create_image(0, 0, anchor="nw")  # type: ignore
+CANVAS.text_bb = None  # type: ignore
+CANVAS.text_bg_size = None  # type: ignore
 CANVAS.text = CANVAS.create_text(  # type: ignore
     1,  # If 0, bbox starts at -1.
     0,
@@ -1493,24 +1983,64 @@ BINDS = [
     (lines_toggle, "l"),
     (resize_handler, "Configure"),
 ]
+BIND_EVENTS = [(f"<{event}>", fun) for fun, keys in BINDS for event in keys.split()]
+MENU_SKIP = frozenset(
+    (
+        browse_frame,
+        browse_percentage,
+        browse_mouse,
+        drag,
+        drag_begin,
+        drag_end,
+        menu_show,
+        resize_handler,
+        scroll,
+        select,
+        zoom,
+        zoom_text,
+    )
+)
+HELP = "\n".join(
+    ("" if " - " in fun.__doc__ else help_keys(keys) + " - ")
+    + fun.__doc__.replace("...", "")
+    for fun, keys in BINDS
+    if fun not in (drag_begin, drag_end, resize_handler)
+)
 
 
 def main():
     """Main function."""
     APP.b_animate = True
     APP.b_lines = False
+    APP.b_resize_pending = False
     APP.b_slideshow = False
+    APP.b_toast_pending = False
+    APP.b_zoom_pending = False
     APP.i_bg = -1
+    APP.i_font_size = FONT_SIZE
     APP.i_path = 0
     APP.i_scroll = -1
     APP.i_zip = 0
     APP.im_scale = 1.0
     APP.info = {}
+    APP.info_cache = (None, "")
+    APP.path_updater = None
+    APP.paths_key = None
+    APP.paths_results = None
+    APP.prefetched = {}
+    APP.resize_results = None
+    APP.resize_timer = None
     APP.f_text_scale = 1.0
-    APP.s_geo = ""
+    APP.h = 0
+    APP.scroll_key = None
     APP.scroll_locked = True
+    APP.slideshow_timer = None
+    APP.toast_due = 0.0
+    APP.toast_shown = None
+    APP.toast_timer = None
     APP.transpose_type = -1
     APP.update_interval = -4000
+    APP.w = 0
 
     parser = argparse.ArgumentParser(
         prog="tk_image_viewer",
@@ -1569,7 +2099,7 @@ def main():
         "-t",
         "--transpose",
         metavar="N",
-        help=f"transpose 0-{len(Transpose)-1} {', '.join(x.name.lower() for x in Transpose)}",
+        help=f"transpose 0-{len(Transpose)-1} {', '.join(TRANSPOSE_NAMES).lower()}",
         default=-1,
         type=int,
     )
@@ -1603,13 +2133,19 @@ def main():
         set_verbosity()
 
     LOG.debug("Args: %s", args)
+    # Pillow-SIMD versions end in .postN.
+    LOG.debug("Pillow %s", Image.__version__)
     APP.paths = []
+    APP.path_entries = {}
+    APP.path_stats = {}
 
     set_supported_files()
 
     APP.fit = args.resize or 0
-    APP.quality = RESIZE_QUALITY[args.quality]
+    APP.i_quality = args.quality
+    APP.quality = RESIZE_QUALITY[APP.i_quality]
     APP.sort = args.order if args.order else "natural"
+    APP.i_sort = SORTS.index(APP.sort) if APP.sort in SORTS else -1
     APP.transpose_type = args.transpose
 
     # Needs visible window so wait for mainloop.
@@ -1629,7 +2165,7 @@ def main():
 
     if args.update:
         APP.update_interval = args.update
-        APP.after(1000, refresh_loop)
+        APP.path_updater = APP.after(1000, refresh_loop)
 
     if args.browse:
         APP.slideshow_pause = args.browse
@@ -3,11 +3,10 @@
 """
 
 # pylint: disable=comparison-with-callable, line-too-long, multiple-imports, too-many-branches
-import logging, re, subprocess  # noqa: E401
+import atexit, functools, logging, re, subprocess, threading  # noqa: E401
 from io import BytesIO
 from typing import Literal, cast
 
-import yaml
 from PIL import ExifTags, Image, ImageCms, IptcImagePlugin, TiffTags
 
 # Add a handler to stream to sys.stderr warnings from all modules.
@@ -51,6 +50,15 @@ EXIF_TAGS = {
     59932: "Padding",
 }
 
+# EXIF UserComment character codes.
+EXIF_CHARSETS = {
+    b"ASCII\0\0\0": ("ascii",),
+    b"UNICODE\0": (
+        "utf-16-be",  # Works despite EXIF byte order being LE.
+        "utf-16-le",  # Turns utf-16-be text Chinese.
+    ),
+}
+
 # From https://gist.github.com/ertaquo/b1d12c37a21268e3d095d39e196f5863
 # https://psd-tools.readthedocs.io/en/latest/reference/psd_tools.psd.image_resources.html
 PSD_RESOURCE_IDS = {
@@ -149,6 +157,11 @@ PSD_RESOURCE_IDS = {
     10000: "PrintFlagsInfo",
 }
 
+BLANK_BYTES_RE = re.compile("b'\\s+'")
+ESCAPES_RE = re.compile(r"(\\x..){2,}")
+EXIFTOOL_LOCK = threading.Lock()  # One request at a time on the shared process.
+UNPRINTABLE_RE = re.compile("[^\x20-\x7f]+")
+
 RENDERING_INTENT = (
     "Perceptual",
     "Relative colorimetric",
@@ -156,19 +169,39 @@ RENDERING_INTENT = (
     "Absolute colorimetric",
 )
 
+EXIF_VALUE_NAMES = {
+    "ColorSpace": {1: "sRGB", 65535: "uncalibrated"},
+    "Orientation": {
+        1: "normal",
+        2: "flip left right",
+        3: "rotate 180",
+        4: "flip top bottom",
+        5: "transpose",
+        6: "rotate 90",
+        7: "transverse",
+        8: "rotate 270",
+    },
+    "ResolutionUnit": {2: "inch", 3: "cm"},
+    "SceneCaptureType": {
+        0: "standard",
+        1: "landscape",
+        2: "portrait",
+        3: "night scene",
+    },
+    "YCbCrPositioning": {1: "centered", 2: "co-sited"},
+}
+
 
 def info_decode(b: bytes, encoding: str) -> str:
     """Decodes a sequence of bytes, as stated by the method signature."""
     if not isinstance(b, bytes):
         return str(b)
     note = f"({len(b)} bytes) "
-    if b.startswith(b"ASCII\0\0\0"):
-        return b[8:].decode("ascii")
-    if b.startswith(b"UNICODE\0"):
+    encodings = EXIF_CHARSETS.get(b[:8])
+    if encodings:
         b = b[8:]
         for enc in (
-            "utf-16-be",  # Works despite EXIF byte order being LE.
-            "utf-16-le",  # Turns utf-16-be text Chinese.
+            *encodings,
             encoding,
             "utf8",  # Leaves \0 of utf-16-be, which print() leaves out! XXX
         ):
@@ -177,15 +210,15 @@ def info_decode(b: bytes, encoding: str) -> str:
                 return b.decode(enc)
             except UnicodeDecodeError:
                 pass
-    s = re.sub("[^\x20-\x7F]+", " ", b.decode("ansi"))
+    s = UNPRINTABLE_RE.sub(" ", b.decode("ansi"))
     if not s:
         s = str(b[:40])
     return (note if len(b) > 10 else "") + s
 
 
-def info_get(im: Image.Image, info: dict, path: str = "") -> str:
-    """Get image info."""
-    msg = ""
+def info_get(im: Image.Image, info: dict, path: str = "", exiftool: bool = True) -> str:
+    """Get image info. Slow exiftool output can be left out to read separately."""
+    lines = [""]
     for k, v in info.items():
         # jfif attribute is just hex version in decimal.
         if k in (
@@ -220,35 +253,38 @@ def info_get(im: Image.Image, info: dict, path: str = "") -> str:
             v = {TiffTags.TAGS_V2[k2]: v2 for k2, v2 in v}
             LOG.debug("tag_v2: %s", v)
         # PNG parameters
-        msg += f"\n{k}: {v}"
+        lines.append(f"{k}: {v}")
         # PNG transparency
-        # msg += f"\n{k}: {(str(v)[:80] + '...') if len(str(v)) > 80 else v}"
+        # lines.append(f"{k}: {(str(v)[:80] + '...') if len(str(v)) > 80 else v}")
     if not im:
-        return msg.replace("\0", "\\0")
+        return "\n".join(lines).replace("\0", "\\0")
 
-    msg += f"\nFormat: {im.format}"
-    try:
-        msg += f"\nMIME type: {im.get_format_mimetype()}"  # type: ignore
-    except AttributeError:
-        pass
+    lines.append(f"Format: {im.format}")
+    mime = getattr(im, "custom_mimetype", None) or Image.MIME.get(im.format or "")
+    if mime:
+        lines.append(f"MIME type: {mime}")
     try:
         # Only JPEG.
-        msg += f"\nBit Depth: {im.bits}"  # type: ignore
+        lines.append(f"Bit Depth: {im.bits}")  # type: ignore
     except AttributeError:
         pass
     pixels = im.width * im.height
     colors = len(im.getcolors(pixels))
-    msg += (
-        f"\nColor Type: {im.mode}"
-        + f"\nColors: {colors:,} ({len(bin(colors-1))-2}-bit)"
-        + f"\nPixels: {pixels:,}"
-    )
-    for fun in (info_exif, info_icc, info_iptc, info_xmp, info_psd, info_exiftool):
-        s = fun(path) if fun == info_exiftool else fun(im)  # type: ignore
+    lines += [
+        f"Color Type: {im.mode}",
+        f"Colors: {colors:,} ({len(bin(colors-1))-2}-bit)",
+        f"Pixels: {pixels:,}",
+    ]
+    for fun in (info_exif, info_icc, info_iptc, info_xmp, info_psd):
+        s = fun(im)
+        if s:
+            lines += ["", s]
+    if exiftool:
+        s = info_exiftool(path)
         if s:
-            msg += "\n\n" + s
+            lines += ["", s]
 
-    return msg.replace("\0", "\\0")
+    return "\n".join(lines).replace("\0", "\\0")
 
 
 def info_exif(im: Image.Image) -> str:
@@ -263,50 +299,27 @@ def info_exif(im: Image.Image) -> str:
     byte_order = cast(
         ByteOrderType, "big" if b"MM" in im.info["exif"][:8] else "little"
     )
-    s = f"EXIF:\nByte order: {byte_order}-endian"
+    lines = ["EXIF:", f"Byte order: {byte_order}-endian"]
     for k, v in exif.items():
         if k not in EXIF_TAGS:
-            s += f"\nUnknown EXIF tag {k}: {v}"
+            lines.append(f"Unknown EXIF tag {k}: {v}")
             continue
         key_name = EXIF_TAGS[k]
-        if key_name == "ColorSpace":
-            v = {1: "sRGB", 65535: "uncalibrated"}.get(v, v)
+        if key_name in EXIF_VALUE_NAMES:
+            v = EXIF_VALUE_NAMES[key_name].get(v, v)
         elif key_name == "ComponentsConfiguration":
             try:
                 v = "".join(("-", "Y", "Cb", "Cr", "R", "G", "B")[B] for B in v)
             except IndexError:
                 pass
-        elif key_name == "Orientation":
-            v = (
-                "",
-                "normal",
-                "flip left right",
-                "rotate 180",
-                "flip top bottom",
-                "transpose",
-                "rotate 90",
-                "transverse",
-                "rotate 270",
-            )[v]
         elif k == 771:
             v = RENDERING_INTENT[int.from_bytes(v, byteorder=byte_order)]
-        elif key_name == "ResolutionUnit":
-            v = {2: "inch", 3: "cm"}.get(v, v)
-        elif key_name == "SceneCaptureType":
-            v = {0: "standard", 1: "landscape", 2: "portrait", 3: "night scene"}.get(
-                v, v
-            )
-        elif key_name == "YCbCrPositioning":
-            v = {
-                1: "centered",
-                2: "co-sited",
-            }.get(v, v)
         elif isinstance(v, bytes) and len(v) < 3:
             v = int.from_bytes(v, byteorder=byte_order)
         else:
             v = info_decode(v, "utf_16_be" if byte_order == "big" else "utf_16_le")
 
-        s += f"\n{key_name}: {v}"
+        lines.append(f"{key_name}: {v}")
 
     # Image File Directory (IFD)
     # exif = IMAGE.getexif()  # type: ignore
@@ -314,62 +327,95 @@ def info_exif(im: Image.Image) -> str:
     #     try:
     #         v = exif.get_ifd(k)
     #         if v:
-    #             s += f"\nIFD tag {k}: {ExifTags.IFD(k).name}: {v}"
+    #             lines.append(f"IFD tag {k}: {ExifTags.IFD(k).name}: {v}")
     #     except KeyError:
     #         log.debug("IFD not found. %s", k)
-    return s.strip()
+    return "\n".join(lines).strip()
 
 
 def info_exiftool(path: str) -> str:
     """Uses exiftool on path."""
     s = ""
     try:
-        output = subprocess.run(
-            [
-                "exiftool",
+        with EXIFTOOL_LOCK:
+            proc = exiftool_start()
+            if proc.poll() is not None:
+                exiftool_start.cache_clear()
+                proc = exiftool_start()
+            args = [
                 "-duplicates",
                 "-groupHeadings",
                 "-unknown2",
-                # "-charset", "filename=utf8",  # Breaks finding regular files on Windows 10 but doesn't matter for Hebrew names.
-                path,
-            ],
-            capture_output=True,
-            check=False,
-            text=False,
-        )  # text=False to avoid dead thread with uncatchable UnicodeDecodeError: 'charmap' codec can't decode byte 0x8f in position 1749: character maps to <undefined> like https://github.com/smarnach/pyexiftool/issues/20
+                # Arguments below are written as UTF-8.
+                "-charset",
+                "filename=utf8",
+                str(path),
+                "-execute",
+            ]
+            proc.stdin.write(("\n".join(args) + "\n").encode("utf8"))  # type: ignore
+            proc.stdin.flush()  # type: ignore
+            output = []
+            for line in iter(proc.stdout.readline, b""):  # type: ignore
+                if line.rstrip() == b"{ready}":
+                    break
+                output.append(line)
+        # Bytes to avoid dead thread with uncatchable UnicodeDecodeError: 'charmap' codec can't decode byte 0x8f in position 1749: character maps to <undefined> like https://github.com/smarnach/pyexiftool/issues/20
         # Output for D:\\art\\__original_drawn_by_pink_ocean__e48c8d8c99313c1f4a86f35f8795c44b.jpg is not utf8, shift-jis, euc_jp, ISO-2022-JP, utf-16-le, or utf-16-be! Not latin1 either but that decodes.
-        s += (
-            output.stdout
-            and output.stdout.decode("ansi", errors="replace").replace("\r", "")
-            or ""
-        ) + output.stderr.decode("ansi", errors="replace").replace("\r", "")
+        s = b"".join(output).decode("ansi", errors="replace").replace("\r", "")
     except FileNotFoundError:
         LOG.debug("Exiftool not on PATH.")
+    except OSError as ex:
+        LOG.error("exiftool pipe fail: %s", ex)
     except UnicodeDecodeError as ex:
         # PyExifTool can't handle Parameters data of naughty test\00032-1238577453.png which Exiftool itself handles fine.
         LOG.error("exiftool read fail: %s", ex)
     return s.strip()
 
 
+@functools.cache
+def exiftool_start() -> subprocess.Popen:
+    """Start exiftool once and keep it reading arguments from stdin."""
+    proc = subprocess.Popen(  # pylint: disable=consider-using-with
+        ["exiftool", "-stay_open", "True", "-@", "-"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    atexit.register(exiftool_stop, proc)
+    return proc
+
+
+def exiftool_stop(proc: subprocess.Popen):
+    """Ask exiftool to exit."""
+    try:
+        proc.stdin.write(b"-stay_open\nFalse\n")  # type: ignore
+        proc.stdin.flush()  # type: ignore
+        proc.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        proc.kill()
+
+
 def info_icc(im: Image.Image) -> str:
     """Return the ICC color profile info."""
-    s = ""
     icc = im.info.get("icc_profile")  # type: ignore
-    if icc:
-        p = ImageCms.ImageCmsProfile(BytesIO(icc))
-        intent = ImageCms.getDefaultIntent(p)
-        man = ImageCms.getProfileManufacturer(p).strip()
-        model = ImageCms.getProfileModel(p).strip()
-        s += f"""ICC Profile:
-Copyright: {ImageCms.getProfileCopyright(p).strip()}
-Description: {ImageCms.getProfileDescription(p).strip()}
-Intent: {RENDERING_INTENT[intent]}
-isIntentSupported: {ImageCms.isIntentSupported(p, ImageCms.Intent(intent), ImageCms.Direction(1))}"""
-        if man:
-            s += f"\nManufacturer: {man}"
-        if model:
-            s += f"\nModel: {model}"
-    return s.strip()
+    if not icc:
+        return ""
+    p = ImageCms.ImageCmsProfile(BytesIO(icc))
+    intent = ImageCms.getDefaultIntent(p)
+    man = ImageCms.getProfileManufacturer(p).strip()
+    model = ImageCms.getProfileModel(p).strip()
+    lines = [
+        "ICC Profile:",
+        f"Copyright: {ImageCms.getProfileCopyright(p).strip()}",
+        f"Description: {ImageCms.getProfileDescription(p).strip()}",
+        f"Intent: {RENDERING_INTENT[intent]}",
+        f"isIntentSupported: {ImageCms.isIntentSupported(p, ImageCms.Intent(intent), ImageCms.Direction(1))}",
+    ]
+    if man:
+        lines.append(f"Manufacturer: {man}")
+    if model:
+        lines.append(f"Model: {model}")
+    return "\n".join(lines).strip()
 
 
 def info_iptc(im: Image.Image) -> str:
@@ -379,10 +425,10 @@ def info_iptc(im: Image.Image) -> str:
     IIM metadata can be embedded into JPEG/Exif, TIFF, JPEG2000 or Portable Network Graphics formatted image files. Other file formats such as GIF or PCX do not support IIM.
     IIM's file structure technology has largely been overtaken by the Extensible Metadata Platform (XMP), but the IIM attribute definitions are the basis for the IPTC Core schema for XMP.
     """
-    s = ""
+    lines = []
     iptc = IptcImagePlugin.getiptcinfo(im)
     if iptc:
-        s += "IPTC:"
+        lines.append("IPTC:")
         for k, v in iptc.items():
             if k == (1, 90):
                 k = "Coded Character Set"
@@ -392,8 +438,8 @@ def info_iptc(im: Image.Image) -> str:
                 v = int.from_bytes(v, "little")
             else:
                 k = IIM_NAMES.get(k, k)
-            s += f"\n{k}: {repr(v)}"
-    return s.strip()
+            lines.append(f"{k}: {repr(v)}")
+    return "\n".join(lines).strip()
 
 
 def info_psd(im: Image.Image) -> str:
@@ -401,9 +447,9 @@ def info_psd(im: Image.Image) -> str:
     info = im.info
     if "photoshop" not in info:
         return ""
-    s = "Photoshop:\n"
+    lines = ["Photoshop:"]
     for k, v in info["photoshop"].items():
-        readable_v = re.sub(r"(\\x..){2,}", " ", str(v)).replace(r"\\0", "")
+        readable_v = psd_readable(v)
         # readable_v = re.sub(
         #     r"\\0", "", re.sub(r"(\\x..){2,}", " ", str(v))
         # ).strip()
@@ -414,19 +460,35 @@ def info_psd(im: Image.Image) -> str:
         #         break
         #     except:
         #         pass
-        if not readable_v or re.match("b'\\s+'", readable_v):
+        if not readable_v or BLANK_BYTES_RE.match(readable_v):
             # Often binary data like version numbers.
             if len(v) < 3:
                 v = int.from_bytes(v, byteorder="big")
-            s += f"{PSD_RESOURCE_IDS.get(k, k)}: {(str(v)[:200] + '...') if len(str(v)) > 200 else v}\n"
+            lines.append(
+                f"{PSD_RESOURCE_IDS.get(k, k)}: {(str(v)[:200] + '...') if len(str(v)) > 200 else v}"
+            )
         else:
-            s += f"{PSD_RESOURCE_IDS.get(k, k)}: {readable_v[:200] + '...' if len(readable_v) > 200 else readable_v}\n"
+            lines.append(
+                f"{PSD_RESOURCE_IDS.get(k, k)}: {readable_v[:200] + '...' if len(readable_v) > 200 else readable_v}"
+            )
         if (
             k == 1036
         ):  # PS5 thumbnail, https://www.awaresystems.be/imaging/tiff/tifftags/docs/photoshopthumbnail.html
             continue
 
-    return s.strip()
+    return "\n".join(lines).strip()
+
+
+def psd_readable(v) -> str:
+    """Return enough of repr(v) with escape runs squeezed to show 200 characters."""
+    # Resources like thumbnails can be megabytes; only the start is shown.
+    n = 4096
+    while True:
+        readable = ESCAPES_RE.sub(" ", str(v[:n])).replace(r"\\0", "")
+        # The last escape run and closing quote may still change with more.
+        if n >= len(v) or len(readable) > 202:
+            return readable
+        n *= 8
 
 
 def info_xmp(im: Image.Image) -> str:
@@ -439,8 +501,7 @@ def info_xmp(im: Image.Image) -> str:
             return ""
     except ValueError as ex:
         return f"XMP: {ex}"
-    s = "XMP:\n"
-    s += yaml.safe_dump(xmp)
+    s = "\n".join(["XMP:", *xmp_lines(xmp)])
     # Ugly:
     # import json
     # s += json.dumps(xmp, indent=2, sort_keys=True)
@@ -448,3 +509,17 @@ def info_xmp(im: Image.Image) -> str:
     # s += toml.dumps(xmp)
     # s += "\n\n" + str(xmp)
     return s.strip()
+
+
+def xmp_lines(obj, indent: str = "") -> list:
+    """Return YAML-like lines for nested XMP dicts and lists."""
+    lines = []
+    is_list = not isinstance(obj, dict)
+    for k, v in enumerate(obj) if is_list else obj.items():
+        label = "-" if is_list else f"{k}:"
+        if isinstance(v, (dict, list, tuple)) and v:
+            lines.append(indent + label)
+            lines += xmp_lines(v, indent + "  ")
+        else:
+            lines.append(f"{indent}{label} {v}")
+    return lines